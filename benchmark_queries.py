@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""回放后端查询的基准测试
+
+在generate_mock_data.py生成的数据集上执行 AnalysisService.queryData 可能生成的所有查询形状
+(维度 category/channel/date × 指标 sales/orders/aov × 类别(含子类别)/渠道过滤)
+和 DataService.getDashboardData 的查询，按配置的并发重复执行，
+输出每个查询的p50/p95/p99延迟、EXPLAIN得到的扫描行数(MySQL分区表还有裁剪后访问的分区数)和吞吐量。
+结果为按查询名排序的JSON，可以在不同规模、不同参数或不同版本的运行之间直接diff。
+"""
+
+import argparse
+import itertools
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pymysql
+
+from generate_mock_data import (
+    EMBEDDED_SINKS, ROLLUP_DDL, connect_embedded, percentile, table_column_types, table_count
+)
+
+TARGETS = ("mysql",) + EMBEDDED_SINKS
+DIMENSIONS = ("category", "channel", "date")
+METRICS = ("sales", "orders", "aov")
+FILTERS = ("categories", "channels")
+PERCENTILES = (50, 95, 99)
+# 需要索引建议的访问方式：全表扫描、全索引扫描、每次查询临时建索引(SQLite)
+SCAN_ACCESS = ("full_scan", "index_scan", "automatic_index")
+SQL_KEYWORDS = {"ON", "WHERE", "JOIN", "GROUP", "ORDER", "LEFT", "INNER", "AS", "UNION"}
+
+# 与analysisService.queryData中的类别查询相同：选定类别及其所有子类别
+CATEGORY_LOOKUP_SQL = """
+    WITH selected_categories AS (
+        SELECT category_id FROM product_categories
+        WHERE category_name IN ({placeholders})
+        UNION
+        SELECT c.category_id FROM product_categories c
+        JOIN product_categories p ON c.parent_category_id = p.category_id
+        WHERE p.category_name IN ({placeholders})
+    )
+    SELECT category_id FROM selected_categories
+"""
+
+# 与dataService.getDashboardData相同的查询(字符串常量改为单引号，MySQL中含义相同)
+DASHBOARD_SQL = {
+    "total_sales": "SELECT SUM(total_amount) as total FROM orders WHERE order_status != 'Cancelled'",
+    "total_orders": "SELECT COUNT(*) as total FROM orders WHERE order_status != 'Cancelled'",
+    "total_users": "SELECT COUNT(*) as total FROM users",
+    "monthly_sales": """
+        SELECT DATE_FORMAT(order_date, '%Y-%m') as month, SUM(total_amount) as sales
+        FROM orders
+        WHERE order_status != 'Cancelled'
+        GROUP BY DATE_FORMAT(order_date, '%Y-%m')
+        ORDER BY month
+    """,
+    "category_sales": """
+        SELECT pc.category_name, SUM(o.total_amount) as sales
+        FROM orders o
+        JOIN order_items oi ON o.order_id = oi.order_id
+        JOIN products p ON oi.product_id = p.product_id
+        JOIN product_categories pc ON p.category_id = pc.category_id
+        WHERE o.order_status != 'Cancelled'
+        GROUP BY pc.category_name
+        ORDER BY sales DESC
+    """,
+    "channel_sales": """
+        SELECT order_source, SUM(total_amount) as sales
+        FROM orders
+        WHERE order_status != 'Cancelled'
+        GROUP BY order_source
+        ORDER BY sales DESC
+    """,
+}
+
+# 同样的仪表盘结果改从汇总表查询，用于对比使用汇总表前后的延迟
+DASHBOARD_ROLLUP_SQL = {
+    "total_sales": "SELECT SUM(total_amount) as total FROM rollup_monthly_sales WHERE order_status != 'Cancelled'",
+    "total_orders": "SELECT SUM(order_count) as total FROM rollup_monthly_sales WHERE order_status != 'Cancelled'",
+    "monthly_sales": """
+        SELECT sale_month as month, SUM(total_amount) as sales
+        FROM rollup_monthly_sales
+        WHERE order_status != 'Cancelled'
+        GROUP BY sale_month
+        ORDER BY month
+    """,
+    "category_sales": """
+        SELECT pc.category_name, SUM(r.order_amount) as sales
+        FROM rollup_daily_sales r
+        JOIN product_categories pc ON r.category_id = pc.category_id
+        WHERE r.order_status != 'Cancelled'
+        GROUP BY pc.category_name
+        ORDER BY sales DESC
+    """,
+    "channel_sales": """
+        SELECT order_source, SUM(total_amount) as sales
+        FROM rollup_monthly_sales
+        WHERE order_status != 'Cancelled'
+        GROUP BY order_source
+        ORDER BY sales DESC
+    """,
+}
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='回放后端查询的基准测试')
+    parser.add_argument('--target', choices=TARGETS, default='mysql',
+                        help='数据库: mysql，或generate_mock_data.py --sink sqlite/duckdb生成的本地数据库文件')
+    parser.add_argument('--db-path', default=None,
+                        help='sqlite/duckdb数据库文件路径，默认为<database>.sqlite或<database>.duckdb')
+    parser.add_argument('--host', default='localhost', help='数据库主机地址')
+    parser.add_argument('--user', default='root', help='数据库用户名')
+    parser.add_argument('--password', default='', help='数据库密码')
+    parser.add_argument('--database', default='ecommerce', help='数据库名称')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='并发执行的连接数，每个连接在独立线程中执行')
+    parser.add_argument('--iterations', type=int, default=20, help='每个查询计时执行的次数')
+    parser.add_argument('--warmup', type=int, default=2, help='每个查询计时前预热执行的次数，至少1次')
+    parser.add_argument('--days', type=int, default=30,
+                        help='queryData的时间范围天数，截止到数据中最后一个订单的日期')
+    parser.add_argument('--start', default=None, help='queryData时间范围开始日期(YYYY-MM-DD)，覆盖--days')
+    parser.add_argument('--end', default=None, help='queryData时间范围结束日期(YYYY-MM-DD)')
+    parser.add_argument('--categories', default=None,
+                        help='类别过滤使用的类别名，逗号分隔，默认为前两个一级类别(含其子类别)')
+    parser.add_argument('--channels', default=None,
+                        help='渠道过滤使用的渠道，逗号分隔，默认为订单中的前两个渠道')
+    parser.add_argument('--match', default=None, help='只执行名称匹配该正则表达式的查询')
+    parser.add_argument('--advise', action='store_true',
+                        help='不计时，对每个查询执行EXPLAIN，报告仍需全表扫描的查询并建议复合索引')
+    parser.add_argument('--advise-min-rows', type=int, default=1000,
+                        help='索引建议忽略行数少于该值的表')
+    parser.add_argument('--output', default='query_benchmark.json', help='结果JSON路径')
+    return parser.parse_args()
+
+
+def _subsets(values, min_size=0):
+    """按values中的顺序枚举所有子集"""
+    return [combo for size in range(min_size, len(values) + 1) for combo in itertools.combinations(values, size)]
+
+
+def build_query_data_sql(dimensions, metrics, time_range, category_ids=None, channels=None):
+    """按analysisService.queryData的逻辑拼出查询语句和参数"""
+    select_clauses = []
+    group_by_clauses = []
+    where_clauses = ["o.order_date BETWEEN %s AND %s"]
+    params = [time_range[0], time_range[1]]
+
+    if "category" in dimensions:
+        select_clauses.append("pc.category_name")
+        group_by_clauses.append("pc.category_name")
+    if "channel" in dimensions:
+        select_clauses.append("o.order_source")
+        group_by_clauses.append("o.order_source")
+    if "date" in dimensions:
+        select_clauses.append("DATE(o.order_date) as order_day")
+        group_by_clauses.append("order_day")
+
+    if "sales" in metrics or not metrics:
+        select_clauses.append("SUM(o.total_amount) as total_sales")
+    if "orders" in metrics or not metrics:
+        select_clauses.append("COUNT(DISTINCT o.order_id) as order_count")
+    if "aov" in metrics or not metrics:
+        select_clauses.append("SUM(o.total_amount) / COUNT(DISTINCT o.order_id) as average_order_value")
+
+    if category_ids:
+        where_clauses.append(f"p.category_id IN ({', '.join(['%s'] * len(category_ids))})")
+        params.extend(category_ids)
+    if channels:
+        where_clauses.append(f"o.order_source IN ({', '.join(['%s'] * len(channels))})")
+        params.extend(channels)
+
+    sql = f"""
+        SELECT {', '.join(select_clauses)}
+        FROM orders o
+        JOIN order_items oi ON o.order_id = oi.order_id
+        JOIN products p ON oi.product_id = p.product_id
+        JOIN product_categories pc ON p.category_id = pc.category_id
+        WHERE {' AND '.join(where_clauses)}
+        {'GROUP BY ' + ', '.join(group_by_clauses) if group_by_clauses else ''}
+    """
+    return sql, params
+
+
+def query_shapes(time_range, categories, channels, rollups=False):
+    """枚举要执行的查询：queryData的所有维度/指标/过滤组合和仪表盘查询
+
+    指标为空时后端返回全部三个指标，与三个指标都选中相同，因此只枚举非空的指标组合。
+    """
+    shapes = []
+    for dimensions in _subsets(DIMENSIONS):
+        for metrics in _subsets(METRICS, min_size=1):
+            for filters in _subsets(FILTERS):
+                name = (f"queryData dims={'+'.join(dimensions) or '-'} metrics={'+'.join(metrics)} "
+                        f"filters={'+'.join(filters) or '-'}")
+                shapes.append({
+                    "name": name,
+                    "dimensions": dimensions,
+                    "metrics": metrics,
+                    "time_range": time_range,
+                    "categories": categories if "categories" in filters else None,
+                    "channels": channels if "channels" in filters else None,
+                })
+    for name, sql in DASHBOARD_SQL.items():
+        shapes.append({"name": f"dashboard {name}", "sql": sql})
+    if rollups:
+        for name, sql in DASHBOARD_ROLLUP_SQL.items():
+            shapes.append({"name": f"dashboard {name} (rollup)", "sql": sql})
+    return shapes
+
+
+def shape_statement(cursor, shape):
+    """返回查询形状的最终语句和参数；类别过滤与后端一样先执行一次类别查询"""
+    if "sql" in shape:
+        return shape["sql"], None
+    category_ids = None
+    if shape["categories"]:
+        placeholders = ", ".join(["%s"] * len(shape["categories"]))
+        cursor.execute(CATEGORY_LOOKUP_SQL.format(placeholders=placeholders), shape["categories"] * 2)
+        category_ids = [row["category_id"] for row in cursor.fetchall()]
+    return build_query_data_sql(shape["dimensions"], shape["metrics"], shape["time_range"],
+                                category_ids, shape["channels"])
+
+
+def run_shape(connection, shape):
+    """执行一次查询形状，返回结果行数"""
+    with connection.cursor() as cursor:
+        sql, params = shape_statement(cursor, shape)
+        cursor.execute(sql, params)
+        return len(cursor.fetchall())
+
+
+def explain_rows(connection, target, shape):
+    """查询扫描的行数
+
+    MySQL为EXPLAIN中各表rows估计之和；DuckDB和SQLite由连接的explain_rows()给出
+    (DuckDB为执行一次的实际扫描行数，SQLite没有行数估计，返回None)。
+    """
+    with connection.cursor() as cursor:
+        sql, params = shape_statement(cursor, shape)
+        if target != "mysql":
+            return connection.explain_rows(sql, params)
+        cursor.execute(f"EXPLAIN {sql}", params)
+        return sum(int(row.get("rows") or 0) for row in cursor.fetchall())
+
+
+def explain_partitions(connection, shape):
+    """MySQL EXPLAIN中每张分区表访问的分区数(分区裁剪后)，没有分区表时返回None"""
+    with connection.cursor() as cursor:
+        sql, params = shape_statement(cursor, shape)
+        cursor.execute(f"EXPLAIN {sql}", params)
+        partitions = {row["table"]: len(row["partitions"].split(","))
+                      for row in cursor.fetchall() if row.get("partitions")}
+    return partitions or None
+
+
+def explain_scans(connection, target, shape):
+    """查询计划中每张表的访问方式，返回(最终语句, [{"table", "access", "index"}])；DuckDB返回None"""
+    with connection.cursor() as cursor:
+        sql, params = shape_statement(cursor, shape)
+        if target != "mysql":
+            return sql, connection.explain_scans(sql, params)
+        cursor.execute(f"EXPLAIN {sql}", params)
+        scans = []
+        for row in cursor.fetchall():
+            if not row.get("table") or row["table"].startswith("<"):
+                continue
+            access = {"ALL": "full_scan", "index": "index_scan"}.get(row["type"], "index")
+            scans.append({"table": row["table"], "access": access, "index": row.get("key")})
+        return sql, scans
+
+
+def table_aliases(sql):
+    """FROM/JOIN子句中的{别名: 表名}，没有别名时别名即表名"""
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.I):
+        if not alias or alias.upper() in SQL_KEYWORDS:
+            alias = table
+        aliases[alias] = table
+    return aliases
+
+
+def suggest_index(sql, alias, table):
+    """按查询中该表各列的用法建议复合索引，返回(表, 列)
+
+    等值/IN条件和关联列在前，其次是一个范围条件列(BETWEEN、!=、比较)，然后是分组列，
+    最后补齐查询用到的其他列，使索引可以覆盖查询而不必回表。
+    """
+    qualified = len(table_aliases(sql)) > 1 or f"{alias}." in sql
+    columns = [column for column in table_column_types(table)
+               if re.search(rf"\b{alias}\.{column}\b" if qualified else rf"\b{column}\b", sql)]
+
+    def ref(column):
+        return rf"\b{alias}\.{column}\b" if qualified else rf"\b{column}\b"
+
+    match = re.search(r"\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|$)", sql, re.S | re.I)
+    where = match.group(1) if match else ""
+    joins = " ".join(re.findall(r"\bON\b(.*?)(?=\bJOIN\b|\bWHERE\b|$)", sql, re.S | re.I))
+    match = re.search(r"\bGROUP BY\b(.*?)(?:\bORDER BY\b|$)", sql, re.S | re.I)
+    group_by = match.group(1) if match else ""
+
+    equality = [column for column in columns
+                if re.search(ref(column) + r"\s*(?:=|IN\s*\()", where, re.I)
+                or re.search(ref(column) + r"\s*=|=\s*" + ref(column), joins)]
+    ranges = [column for column in columns if column not in equality
+              and re.search(ref(column) + r"\s*(?:BETWEEN\b|!=|<>|<|>)", where, re.I)]
+    grouped = [column for column in columns if re.search(ref(column), group_by)]
+    ordered = []
+    for column in equality + ranges[:1] + grouped + ranges[1:] + columns:
+        if column not in ordered:
+            ordered.append(column)
+    return table, tuple(ordered)
+
+
+def advise(connection, target, shapes, min_rows):
+    """对每个查询执行EXPLAIN，找出仍需扫描整张表(或整个索引)的查询并汇总建议的复合索引"""
+    row_counts = {}
+    full_scans = {}
+    suggestions = {}
+    for shape in shapes:
+        sql, scans = explain_scans(connection, target, shape)
+        if scans is None:
+            return None
+        aliases = table_aliases(sql)
+        flagged = []
+        for scan in scans:
+            table = aliases.get(scan["table"], scan["table"])
+            if scan["access"] not in SCAN_ACCESS or table not in aliases.values():
+                continue
+            if table not in row_counts:
+                row_counts[table] = table_count(connection, table)
+            if row_counts[table] < min_rows:
+                continue
+            # 已经是全索引扫描(覆盖索引)的查询需要聚合整张表，再加索引没有帮助，应改用汇总表
+            spec = None
+            if scan["access"] != "index_scan":
+                index_table, columns = suggest_index(sql, scan["table"], table)
+                if columns:
+                    spec = f"{index_table}({','.join(columns)})"
+                    suggestions.setdefault(spec, []).append(shape["name"])
+            flagged.append({"table": table, "access": scan["access"], "index": scan["index"],
+                            "rows": row_counts[table], "suggested_index": spec})
+        if flagged:
+            full_scans[shape["name"]] = flagged
+    return {
+        "queries": len(shapes),
+        "queries_with_scans": len(full_scans),
+        "scans": full_scans,
+        "suggested_indexes": {spec: {"queries": len(names), "examples": names[:5]}
+                              for spec, names in sorted(suggestions.items(), key=lambda item: -len(item[1]))},
+    }
+
+
+def benchmark_shape(connections, shape, iterations, warmup):
+    """预热后在所有连接上并发执行iterations次，返回延迟分布和吞吐量"""
+    # 第一次预热同时记录返回的行数
+    rows = run_shape(connections[0], shape)
+    for _ in range(warmup - 1):
+        run_shape(connections[0], shape)
+    latencies = []
+
+    def worker(connection, count):
+        for _ in range(count):
+            started = time.perf_counter()
+            run_shape(connection, shape)
+            latencies.append(time.perf_counter() - started)
+
+    counts = [iterations // len(connections) + (1 if i < iterations % len(connections) else 0)
+              for i in range(len(connections))]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(connections)) as pool:
+        for future in [pool.submit(worker, connection, count)
+                       for connection, count in zip(connections, counts) if count]:
+            future.result()
+    wall_seconds = time.perf_counter() - started
+
+    latencies.sort()
+    result = {f"p{p}_ms": round(percentile(latencies, p) * 1000, 3) for p in PERCENTILES}
+    result.update(
+        iterations=len(latencies),
+        mean_ms=round(sum(latencies) / len(latencies) * 1000, 3),
+        max_ms=round(latencies[-1] * 1000, 3),
+        queries_per_second=round(len(latencies) / wall_seconds, 2),
+        rows_returned=rows,
+    )
+    return result
+
+
+def connect(args):
+    """打开一个到被测数据库的连接"""
+    if args.target == "mysql":
+        return pymysql.connect(host=args.host, user=args.user, password=args.password, db=args.database,
+                               charset='utf8mb4', cursorclass=pymysql.cursors.DictCursor)
+    return connect_embedded(args.target, args.db_path or f"{args.database}.{args.target}")
+
+
+def dataset_info(connection):
+    """数据集规模和订单时间范围"""
+    info = {table: table_count(connection, table) for table in ("orders", "order_items", "products", "users")}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT MIN(order_date) AS first_order, MAX(order_date) AS last_order FROM orders")
+        row = cursor.fetchone()
+    # SQLite的聚合结果不带声明类型，日期以字符串返回
+    for key in ("first_order", "last_order"):
+        value = row[key]
+        info[key] = datetime.fromisoformat(value) if isinstance(value, str) else value
+    return info
+
+
+def default_filters(connection):
+    """默认的类别过滤(前两个一级类别，含子类别)和渠道过滤(前两个渠道)"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT category_name FROM product_categories WHERE category_level = 1 "
+                       "ORDER BY category_id LIMIT 2")
+        categories = [row["category_name"] for row in cursor.fetchall()]
+        cursor.execute("SELECT DISTINCT order_source FROM orders ORDER BY order_source LIMIT 2")
+        channels = [row["order_source"] for row in cursor.fetchall()]
+    return categories, channels
+
+
+def has_rollups(connection):
+    """数据集中是否有generate_mock_data.py生成的汇总表"""
+    with connection.cursor() as cursor:
+        for table in ROLLUP_DDL:
+            cursor.execute(f"SHOW TABLES LIKE '{table}'")
+            if not cursor.fetchone():
+                return False
+    return table_count(connection, "rollup_monthly_sales") > 0
+
+
+def main():
+    args = parse_args()
+    connections = [connect(args) for _ in range(max(1, args.concurrency))]
+    try:
+        connection = connections[0]
+        dataset = dataset_info(connection)
+        if dataset["last_order"] is None:
+            raise SystemExit("订单表没有数据，请先用generate_mock_data.py生成数据")
+        end = args.end or f"{dataset['last_order']:%Y-%m-%d}"
+        start = args.start or f"{datetime.strptime(end, '%Y-%m-%d') - timedelta(days=args.days):%Y-%m-%d}"
+        categories, channels = default_filters(connection)
+        if args.categories:
+            categories = args.categories.split(",")
+        if args.channels:
+            channels = args.channels.split(",")
+
+        shapes = query_shapes((start, end), categories, channels, rollups=has_rollups(connection))
+        if args.match:
+            shapes = [shape for shape in shapes if re.search(args.match, shape["name"])]
+        results = {}
+        advice = None
+        started = time.perf_counter()
+        if args.advise:
+            print(f"对 {len(shapes)} 个查询执行EXPLAIN (queryData时间范围 {start} 至 {end})")
+            advice = advise(connection, args.target, shapes, args.advise_min_rows)
+            if advice is None:
+                print(f"{args.target} 不使用二级索引做范围扫描，没有索引建议")
+            else:
+                print(f"{advice['queries_with_scans']} 个查询仍需扫描整张表或整个索引，建议的复合索引"
+                      f"(可用于 generate_mock_data.py --index):")
+                for spec, suggestion in advice["suggested_indexes"].items():
+                    print(f"  {spec:<70} {suggestion['queries']:>4} 个查询")
+        else:
+            print(f"在 {args.target} 上执行 {len(shapes)} 个查询，并发 {len(connections)}，"
+                  f"每个查询 {args.iterations} 次 (queryData时间范围 {start} 至 {end})")
+            for shape in shapes:
+                result = benchmark_shape(connections, shape, max(1, args.iterations), args.warmup)
+                result["rows_examined"] = explain_rows(connection, args.target, shape)
+                if args.target == "mysql":
+                    result["partitions_scanned"] = explain_partitions(connection, shape)
+                results[shape["name"]] = result
+                print(f"  {shape['name']:<70} p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+                      f"{result['queries_per_second']:>8.1f} 次/秒")
+        wall_seconds = time.perf_counter() - started
+    finally:
+        for connection in connections:
+            connection.close()
+
+    total = sum(result["iterations"] for result in results.values())
+    report = {
+        "config": {
+            "target": args.target, "database": args.db_path or args.database,
+            "concurrency": len(connections), "iterations": args.iterations, "warmup": args.warmup,
+            "time_range": [start, end], "categories": categories, "channels": channels,
+        },
+        "dataset": dataset,
+        "queries": results,
+        "advice": advice,
+        "totals": {
+            "queries": len(results),
+            "executions": total,
+            "wall_seconds": round(wall_seconds, 3),
+            "queries_per_second": round(total / wall_seconds, 2) if wall_seconds > 0 else None,
+        },
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True, default=str)
+    print(f"基准测试结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
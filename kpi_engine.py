@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""从generate_mock_data.py --sink parquet生成的列式数据离线计算运营指标
+
+覆盖电商运营数据分析指标.md中能由模拟数据得到的指标：GMV、订单量、客单价(AOV)、取消率、复购率、
+PV/UV/会话转化率、类目销售贡献和营销活动ROI，以及分析报告提示词使用的queryData预聚合结果
+(类别/渠道/日期各种组合的total_sales、order_count、average_order_value)。
+
+计算只扫描一遍数据：订单和订单明细按月份分区(month=YYYY-MM)逐月读入，每月用Arrow的向量化
+group_by得到部分聚合，最后合并；每个订单只属于一个月份分区，因此逐月的去重订单数相加就是整体的去重数。
+访问日志不分区，按--batch-size分批流式读取。金额按整数分累加，与MySQL中DECIMAL的求和结果一致。
+--compare在数据库上执行后端queryData的查询，与离线结果逐行比对，可以在大规模数据上快速校验后端SQL。
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from benchmark_queries import DIMENSIONS, TARGETS, _subsets, build_query_data_sql, connect
+
+# queryData各维度对应的结果列
+DIMENSION_COLUMNS = {"category": "category_name", "channel": "order_source", "date": "order_day"}
+CANCELLED_STATUS = "已取消"
+# 下单会话的最后一页，含该页的会话为转化会话
+CONVERSION_PAGE = "/order/success"
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='从列式数据离线计算电商运营指标')
+    parser.add_argument('--input-dir', default='mock_data',
+                        help='generate_mock_data.py --sink parquet的输出目录')
+    parser.add_argument('--start', default=None,
+                        help='时间范围开始(YYYY-MM-DD[ HH:MM:SS])，与queryData一样包含两端，默认不限')
+    parser.add_argument('--end', default=None, help='时间范围结束(YYYY-MM-DD[ HH:MM:SS])')
+    parser.add_argument('--batch-size', type=int, default=1000000, help='流式读取访问日志时每批的行数')
+    parser.add_argument('--output', default='kpi_report.json', help='结果JSON路径')
+    parser.add_argument('--compare', action='store_true',
+                        help='在--target数据库上执行queryData所有维度组合的查询，与离线结果比对')
+    parser.add_argument('--target', choices=TARGETS, default='mysql', help='--compare使用的数据库')
+    parser.add_argument('--db-path', default=None,
+                        help='sqlite/duckdb数据库文件路径，默认为<database>.sqlite或<database>.duckdb')
+    parser.add_argument('--host', default='localhost', help='数据库主机地址')
+    parser.add_argument('--user', default='root', help='数据库用户名')
+    parser.add_argument('--password', default='', help='数据库密码')
+    parser.add_argument('--database', default='ecommerce', help='数据库名称')
+    return parser.parse_args()
+
+
+def _cents(values):
+    """DECIMAL(10, 2)金额转换为整数分"""
+    return pc.cast(pc.round(pc.multiply(pc.cast(values, pa.float64()), 100)), pa.int64())
+
+
+def _amount(cents):
+    return round(cents / 100, 2)
+
+
+def _ratio(numerator, denominator, digits=4):
+    return round(numerator / denominator, digits) if denominator else None
+
+
+def _aggregate(table, keys, aggregations):
+    """group_by聚合，aggregations为[(结果列, 列, 聚合函数)]；keys为空时聚合整张表"""
+    result = table.group_by(list(keys)).aggregate([(column, function) for _, column, function in aggregations])
+    columns = {key: result[key] for key in keys}
+    columns.update({name: result[f"{column}_{function}"] for name, column, function in aggregations})
+    return pa.table(columns)
+
+
+def _merge(parts, keys, columns):
+    """合并逐月的部分聚合：各列按keys分组求和"""
+    if not parts:
+        return []
+    merged = _aggregate(pa.concat_tables(parts), keys, [(column, column, "sum") for column in columns])
+    return merged.sort_by([(key, "ascending") for key in keys]).to_pylist() if keys else merged.to_pylist()
+
+
+def _parquet_files(directory):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(directory)
+                  for name in names if name.endswith(".parquet"))
+
+
+class KpiEngine:
+    """逐月扫描订单和明细、分批扫描访问日志，累积部分聚合，report()合并为指标"""
+
+    def __init__(self, input_dir, start=None, end=None, batch_size=1000000):
+        self.input_dir = input_dir
+        self.start = start
+        self.end = end
+        self.batch_size = max(1, batch_size)
+        self.first_order = None
+        self.last_order = None
+        self.parts = {name: [] for name in ("daily", "channels", "statuses", "categories", "top_categories",
+                                            "campaigns", "visits")}
+        self.parts.update({self.query_name(dimensions): [] for dimensions in _subsets(DIMENSIONS)})
+        self._load_reference()
+
+    @staticmethod
+    def query_name(dimensions):
+        return "+".join(dimensions) or "-"
+
+    def _read(self, *path, columns=None):
+        return pq.read_table(os.path.join(self.input_dir, *path), columns=columns)
+
+    def _load_reference(self):
+        """商品->类目、类目名称和一级类目、活动及订单-活动关联，按ID建立查找数组"""
+        if not os.path.isdir(os.path.join(self.input_dir, "orders")):
+            raise SystemExit(f"{self.input_dir} 下没有orders目录，请先用 generate_mock_data.py --sink parquet 生成数据")
+        products = self._read("products", columns=["product_id", "category_id"])
+        product_ids = products["product_id"].to_numpy()
+        self.product_category = np.zeros(product_ids.max() + 1, dtype=np.int32)
+        self.product_category[product_ids] = products["category_id"].to_numpy()
+
+        self.categories = {row["category_id"]: row for row in self._read("product_categories").to_pylist()}
+        size = max(self.categories) + 1
+        names, tops = [None] * size, np.zeros(size, dtype=np.int32)
+        for category_id, row in self.categories.items():
+            names[category_id] = row["category_name"]
+            top = category_id
+            while self.categories[top]["parent_category_id"] is not None:
+                top = self.categories[top]["parent_category_id"]
+            tops[category_id] = top
+        self.category_names = pa.array(names, pa.string())
+        self.top_category = tops
+
+        self.campaigns = self._read("marketing_campaigns").to_pylist()
+        self.campaign_map = self._read("order_campaign_map", columns=["order_id", "campaign_id"])
+        users = self._read("users", columns=["user_id"])
+        self.user_total = users.num_rows
+        max_user = pc.max(users["user_id"]).as_py() or 0
+        self.user_orders = np.zeros(max_user + 1, dtype=np.int64)
+        self.visitors = np.zeros(max_user + 1, dtype=bool)
+
+    def _in_range(self, table, column):
+        """与queryData的BETWEEN一样，保留[start, end]内的行"""
+        mask = None
+        for bound, compare in ((self.start, pc.greater_equal), (self.end, pc.less_equal)):
+            if bound is not None:
+                condition = compare(table[column], pa.scalar(bound, table.schema.field(column).type))
+                mask = condition if mask is None else pc.and_(mask, condition)
+        return table if mask is None else table.filter(mask)
+
+    def run(self):
+        months = sorted(name for name in os.listdir(os.path.join(self.input_dir, "orders"))
+                        if name.startswith("month="))
+        for month in months:
+            started = time.perf_counter()
+            orders = self._process_orders(month)
+            print(f"  {month[6:]}  {orders:>10} 个订单  {time.perf_counter() - started:>7.2f} 秒")
+        started = time.perf_counter()
+        visits = self._process_visits()
+        print(f"  访问日志  {visits:>10} 行  {time.perf_counter() - started:>7.2f} 秒")
+        return self.report()
+
+    def _process_orders(self, month):
+        """一个月份分区的订单和明细：订单级、明细级和queryData的部分聚合"""
+        raw = self._in_range(self._read("orders", month, columns=[
+            "order_id", "user_id", "order_date", "total_amount", "discount_amount", "order_status",
+            "order_source"]), "order_date")
+        if not raw.num_rows:
+            return 0
+        low, high = pc.min_max(raw["order_date"]).values()
+        self.first_order = min(filter(None, (self.first_order, low.as_py())))
+        self.last_order = max(filter(None, (self.last_order, high.as_py())))
+        orders = pa.table({
+            "order_id": raw["order_id"],
+            "order_day": pc.cast(raw["order_date"], pa.date32()),
+            "order_source": raw["order_source"].cast(pa.string()),
+            "order_status": raw["order_status"].cast(pa.string()),
+            "total": _cents(raw["total_amount"]),
+            "discount": _cents(raw["discount_amount"]),
+        })
+        order_sums = [("gmv", "total", "sum"), ("discount", "discount", "sum"), ("orders", "order_id", "count")]
+        self.parts["daily"].append(_aggregate(orders, ["order_day"], order_sums))
+        self.parts["channels"].append(_aggregate(orders, ["order_source"], order_sums))
+        self.parts["statuses"].append(_aggregate(orders, ["order_status"], order_sums))
+        user_ids = raw["user_id"].fill_null(0).to_numpy()
+        self.user_orders += np.bincount(user_ids, minlength=len(self.user_orders))[:len(self.user_orders)]
+
+        # 订单-活动关联只取本月订单的ID区间，再与订单连接
+        order_ids = raw["order_id"]
+        first_id, last_id = pc.min_max(order_ids).values()
+        campaign_map = self.campaign_map.filter(pc.and_(
+            pc.greater_equal(self.campaign_map["order_id"], first_id),
+            pc.less_equal(self.campaign_map["order_id"], last_id)))
+        if campaign_map.num_rows:
+            joined = campaign_map.join(orders.select(["order_id", "total", "discount"]), "order_id", join_type="inner")
+            self.parts["campaigns"].append(_aggregate(joined, ["campaign_id"], order_sums))
+
+        items = self._read("order_items", month, columns=["order_id", "product_id", "quantity", "unit_price",
+                                                          "discount"])
+        category_ids = pa.array(self.product_category[items["product_id"].to_numpy()])
+        quantity = pc.cast(items["quantity"], pa.int64())
+        items = pa.table({
+            "order_id": items["order_id"],
+            "category_id": category_ids,
+            "top_category_id": pa.array(self.top_category[category_ids.to_numpy()]),
+            "quantity": quantity,
+            "amount": pc.multiply(pc.subtract(_cents(items["unit_price"]), _cents(items["discount"])), quantity),
+        })
+        # 与queryData相同的内连接：时间范围外的订单的明细被过滤，订单金额按明细行重复累加
+        joined = items.join(orders.select(["order_id", "order_day", "order_source", "total"]), "order_id",
+                            join_type="inner")
+        joined = joined.append_column("category_name", self.category_names.take(joined["category_id"]))
+        item_sums = [("amount", "amount", "sum"), ("quantity", "quantity", "sum"),
+                     ("orders", "order_id", "count_distinct")]
+        self.parts["categories"].append(_aggregate(joined, ["category_id"], item_sums))
+        self.parts["top_categories"].append(_aggregate(joined, ["top_category_id"], item_sums))
+        for dimensions in _subsets(DIMENSIONS):
+            keys = [DIMENSION_COLUMNS[dimension] for dimension in dimensions]
+            self.parts[self.query_name(dimensions)].append(_aggregate(
+                joined, keys, [("total_sales", "total", "sum"), ("order_count", "order_id", "count_distinct")]))
+        return orders.num_rows
+
+    def _process_visits(self):
+        """分批扫描访问日志：每天的PV、会话数和转化会话数，以及访问过的用户
+
+        同一会话的页面在文件中连续，会话数为session_id与上一行不同的行数；批之间保留上一行的session_id。
+        """
+        rows = 0
+        for path in _parquet_files(os.path.join(self.input_dir, "visit_logs")):
+            previous = None
+            parquet = pq.ParquetFile(path)
+            for batch in parquet.iter_batches(batch_size=self.batch_size,
+                                              columns=["user_id", "session_id", "page_url", "visit_time"]):
+                batch = self._in_range(pa.Table.from_batches([batch]), "visit_time")
+                if not batch.num_rows:
+                    continue
+                sessions = batch["session_id"].combine_chunks()
+                shifted = pa.concat_arrays([pa.array([previous], pa.string()), sessions.slice(0, len(sessions) - 1)])
+                starts = pc.fill_null(pc.not_equal(sessions, shifted), True)
+                previous = sessions[-1].as_py()
+                visits = pa.table({
+                    "visit_day": pc.cast(batch["visit_time"], pa.date32()),
+                    "pv": pa.array(np.ones(batch.num_rows, dtype=np.int64)),
+                    "sessions": pc.cast(starts, pa.int64()),
+                    "conversions": pc.cast(pc.starts_with(batch["page_url"], CONVERSION_PAGE), pa.int64()),
+                })
+                self.parts["visits"].append(_aggregate(visits, ["visit_day"], [
+                    (column, column, "sum") for column in ("pv", "sessions", "conversions")]))
+                self.visitors[pc.drop_null(batch["user_id"]).to_numpy()] = True
+                rows += batch.num_rows
+        return rows
+
+    def report(self):
+        """合并部分聚合，计算比率类指标"""
+        sums = ("gmv", "discount", "orders")
+        daily = _merge(self.parts["daily"], ["order_day"], sums)
+        channels = _merge(self.parts["channels"], ["order_source"], sums)
+        statuses = _merge(self.parts["statuses"], ["order_status"], sums)
+        visits = {row["visit_day"]: row for row in _merge(self.parts["visits"], ["visit_day"],
+                                                         ("pv", "sessions", "conversions"))}
+        gmv = sum(row["gmv"] for row in daily)
+        order_count = sum(row["orders"] for row in daily)
+        cancelled = next((row for row in statuses if row["order_status"] == CANCELLED_STATUS),
+                         {"gmv": 0, "orders": 0})
+        sessions = sum(row["sessions"] for row in visits.values())
+        conversions = sum(row["conversions"] for row in visits.values())
+        buyers = int((self.user_orders > 0).sum())
+        repeat_buyers = int((self.user_orders > 1).sum())
+
+        def order_metrics(row):
+            return {"gmv": _amount(row["gmv"]), "orders": row["orders"], "discount": _amount(row["discount"]),
+                    "aov": _amount(row["gmv"] / row["orders"]) if row["orders"] else None,
+                    "gmv_share": _ratio(row["gmv"], gmv)}
+
+        def item_metrics(row, total):
+            return {"item_amount": _amount(row["amount"]), "quantity": row["quantity"], "orders": row["orders"],
+                    "share": _ratio(row["amount"], total)}
+
+        categories = _merge(self.parts["categories"], ["category_id"], ("amount", "quantity", "orders"))
+        top_categories = _merge(self.parts["top_categories"], ["top_category_id"], ("amount", "quantity", "orders"))
+        item_total = sum(row["amount"] for row in categories)
+        campaign_sums = {row["campaign_id"]: row for row in _merge(self.parts["campaigns"], ["campaign_id"], sums)}
+        campaigns = []
+        for campaign in self.campaigns:
+            row = campaign_sums.get(campaign["campaign_id"], {"gmv": 0, "discount": 0, "orders": 0})
+            budget = int(round(campaign["budget"] * 100))
+            campaigns.append({
+                "campaign_id": campaign["campaign_id"], "campaign_name": campaign["campaign_name"],
+                "start_date": campaign["start_date"], "end_date": campaign["end_date"], "budget": _amount(budget),
+                **order_metrics(row),
+                "discount_rate": _ratio(row["discount"], row["gmv"] + row["discount"]),
+                # 投资回报率：(活动订单GMV - 预算) / 预算
+                "roi": _ratio(row["gmv"] - budget, budget),
+            })
+
+        query_data = {}
+        for dimensions in _subsets(DIMENSIONS):
+            name = self.query_name(dimensions)
+            keys = [DIMENSION_COLUMNS[dimension] for dimension in dimensions]
+            rows = _merge(self.parts[name], keys, ("total_sales", "order_count"))
+            query_data[name] = [
+                {**{key: row[key] for key in keys}, "total_sales": _amount(row["total_sales"]),
+                 "order_count": row["order_count"],
+                 "average_order_value": _amount(row["total_sales"] / row["order_count"])}
+                for row in rows if row["order_count"]
+            ]
+
+        return {
+            "time_range": [self.first_order, self.last_order],
+            "overview": {
+                "gmv": _amount(gmv), "orders": order_count, "aov": _amount(gmv / order_count) if order_count else None,
+                "discount": _amount(sum(row["discount"] for row in daily)),
+                "net_gmv": _amount(gmv - cancelled["gmv"]), "cancel_rate": _ratio(cancelled["orders"], order_count),
+                "users": self.user_total, "buyers": buyers, "repeat_buyers": repeat_buyers,
+                "repurchase_rate": _ratio(repeat_buyers, buyers),
+                "pv": sum(row["pv"] for row in visits.values()), "uv": int(self.visitors.sum()),
+                "sessions": sessions, "converted_sessions": conversions,
+                "conversion_rate": _ratio(conversions, sessions),
+            },
+            "daily": [
+                {"date": row["order_day"], **order_metrics(row),
+                 "pv": visits.get(row["order_day"], {}).get("pv", 0),
+                 "sessions": visits.get(row["order_day"], {}).get("sessions", 0),
+                 "conversion_rate": _ratio(visits.get(row["order_day"], {}).get("conversions", 0),
+                                           visits.get(row["order_day"], {}).get("sessions", 0))}
+                for row in daily
+            ],
+            "channels": [{"order_source": row["order_source"], **order_metrics(row)} for row in channels],
+            "order_status": [{"order_status": row["order_status"], **order_metrics(row)} for row in statuses],
+            "categories": [
+                {"category_id": row["category_id"],
+                 "category_name": self.categories[row["category_id"]]["category_name"],
+                 "parent_category_id": self.categories[row["category_id"]]["parent_category_id"],
+                 **item_metrics(row, item_total)}
+                for row in categories
+            ],
+            "top_categories": [
+                {"category_id": row["top_category_id"],
+                 "category_name": self.categories[row["top_category_id"]]["category_name"],
+                 **item_metrics(row, item_total)}
+                for row in top_categories
+            ],
+            "campaigns": campaigns,
+            "query_data": query_data,
+        }
+
+
+def _row_key(row, dimensions):
+    # SQLite的DATE()返回字符串，MySQL/DuckDB返回日期
+    values = [row[DIMENSION_COLUMNS[dimension]] for dimension in dimensions]
+    return tuple(str(value)[:10] if dimension == "date" else value for dimension, value in zip(dimensions, values))
+
+
+def compare_query_data(connection, query_data, time_range):
+    """在数据库上执行queryData各维度组合的查询(不带过滤)，逐行比对total_sales和order_count"""
+    results = {}
+    for dimensions in _subsets(DIMENSIONS):
+        name = KpiEngine.query_name(dimensions)
+        sql, params = build_query_data_sql(dimensions, (), time_range)
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = [row for row in cursor.fetchall() if row["order_count"]]
+        seconds = time.perf_counter() - started
+        offline = {_row_key(row, dimensions): row for row in query_data[name]}
+        database = {_row_key(row, dimensions): row for row in rows}
+        mismatches = []
+        for key in sorted(set(offline) | set(database), key=str):
+            expected, actual = offline.get(key), database.get(key)
+            if (expected is None or actual is None
+                    or abs(expected["total_sales"] - float(actual["total_sales"])) >= 0.005
+                    or expected["order_count"] != int(actual["order_count"])):
+                mismatches.append({
+                    "key": list(key),
+                    "offline": expected and [expected["total_sales"], expected["order_count"]],
+                    "database": actual and [float(actual["total_sales"]), int(actual["order_count"])],
+                })
+        results[name] = {"rows": len(database), "mismatches": len(mismatches), "samples": mismatches[:5],
+                         "database_seconds": round(seconds, 3)}
+    return results
+
+
+def main():
+    args = parse_args()
+    start = datetime.fromisoformat(args.start) if args.start else None
+    end = datetime.fromisoformat(args.end) if args.end else None
+    started = time.perf_counter()
+    print(f"从 {args.input_dir} 计算运营指标")
+    engine = KpiEngine(args.input_dir, start, end, args.batch_size)
+    report = engine.run()
+    seconds = time.perf_counter() - started
+    if report["time_range"][0] is None:
+        raise SystemExit("时间范围内没有订单")
+
+    overview = report["overview"]
+    print(f"GMV {overview['gmv']:.2f}  订单 {overview['orders']}  客单价 {overview['aov']:.2f}  "
+          f"复购率 {overview['repurchase_rate']}  会话转化率 {overview['conversion_rate']}  耗时 {seconds:.2f} 秒")
+    comparison = None
+    if args.compare:
+        time_range = tuple(f"{value:%Y-%m-%d %H:%M:%S}" for value in (start or report["time_range"][0],
+                                                                     end or report["time_range"][1]))
+        connection = connect(args)
+        try:
+            comparison = compare_query_data(connection, report["query_data"], time_range)
+        finally:
+            connection.close()
+        for name, result in comparison.items():
+            status = "一致" if not result["mismatches"] else f"{result['mismatches']} 行不一致"
+            print(f"  queryData dims={name:<22} {result['rows']:>8} 行  {status}  "
+                  f"(数据库 {result['database_seconds']:.2f} 秒)")
+
+    report["config"] = {"input_dir": args.input_dir, "start": args.start, "end": args.end,
+                        "seconds": round(seconds, 3)}
+    report["comparison"] = comparison
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True, default=str)
+    print(f"指标已写入: {args.output}")
+    if comparison and any(result["mismatches"] for result in comparison.values()):
+        raise SystemExit("离线结果与数据库查询结果不一致，详见 comparison")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""清空generate_mock_data.py生成的数据集，回到可以重新生成的状态
+
+生成器不会写入已有数据的表，而在大数据量下逐行DELETE订单和订单明细非常慢。这里把生成器的表按外键拓扑排序
+(子表在父表之前，如order_items在orders之前、products在product_categories之前)，关闭外键检查后依次清空：
+
+- MySQL用TRUNCATE TABLE(删除并重建表空间，与表的大小无关)；按月份分区的表清空后再REMOVE PARTITIONING，
+  下次以--partition-by-month生成时按新的时间窗口重新建分区，不会残留上一次的月份分区
+- DuckDB用TRUNCATE，SQLite用不带WHERE的DELETE(SQLite会直接清空表的B树)
+
+汇总表、检查点表和快照标记表一并清空；platform_users(Web应用的登录用户)不属于生成的数据，保持不变。
+--recreate时改为按同样的顺序DROP TABLE后按TABLE_DDL重新建表，二级索引和表结构的手工改动随之清除。
+
+    python reset_dataset.py --yes
+    python reset_dataset.py --target sqlite --recreate --yes
+"""
+
+import argparse
+import os
+import re
+import time
+
+import pymysql
+
+from generate_mock_data import (
+    CHECKPOINT_DDL, EMBEDDED_SINKS, PARTITIONED_TABLES, ROLLUP_DDL, TABLE_DDL, _shard_spec, apply_dataset_spec,
+    connect_embedded, create_tables, load_dataset_spec, read_partitions, shard_configs
+)
+from snapshot_dataset import SNAPSHOT_MARKER_DDL
+
+TARGETS = ("mysql",) + EMBEDDED_SINKS
+# 不参与外键的辅助表：汇总表、生成检查点和快照标记
+AUXILIARY_TABLES = tuple(ROLLUP_DDL) + tuple(
+    re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", ddl).group(1) for ddl in (CHECKPOINT_DDL, SNAPSHOT_MARKER_DDL))
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='清空或重建模拟数据集的表')
+    parser.add_argument('--target', choices=TARGETS, default='mysql',
+                        help='数据库: mysql，或generate_mock_data.py --sink sqlite/duckdb生成的本地数据库文件')
+    parser.add_argument('--db-path', default=None,
+                        help='sqlite/duckdb数据库文件路径，默认为<database>.sqlite或<database>.duckdb')
+    parser.add_argument('--host', default='localhost', help='数据库主机地址')
+    parser.add_argument('--user', default='root', help='数据库用户名')
+    parser.add_argument('--password', default='', help='数据库密码')
+    parser.add_argument('--database', default='ecommerce', help='数据库名称')
+    parser.add_argument('--shards', type=_shard_spec, default=None,
+                        help='与generate_mock_data.py --shards相同，清空每个分片')
+    parser.add_argument('--recreate', action='store_true',
+                        help='DROP TABLE后按TABLE_DDL重新建表，而不是只清空数据')
+    parser.add_argument('--partition-by-month', action='store_true',
+                        help='--recreate时按--partition-by-month的分区兼容结构建表(仅mysql)')
+    parser.add_argument('--spec', type=load_dataset_spec, default=None,
+                        help='生成时使用的--spec描述文件，其中声明的表按外键顺序一并清空')
+    parser.add_argument('--yes', action='store_true', help='不再确认，直接清空')
+    return parser.parse_args()
+
+
+def teardown_order():
+    """TABLE_DDL中的表按外键拓扑排序：引用其他表的子表排在被引用的父表之前，自引用(父类目)不影响顺序"""
+    parents = {table: set(re.findall(r"REFERENCES (\w+)\(", ddl)) - {table} for table, ddl in TABLE_DDL.items()}
+    order = []
+    while parents:
+        # 不再被剩余的任何表引用的表可以先清空
+        leaves = [table for table in parents
+                  if not any(table in referenced for other, referenced in parents.items() if other != table)]
+        if not leaves:
+            raise ValueError(f"外键存在环: {', '.join(parents)}")
+        for table in leaves:
+            order.append(table)
+            del parents[table]
+    return order
+
+
+def connect(args):
+    """打开要清空的数据库的连接，--shards时每个分片一个"""
+    if args.target != "mysql":
+        path = args.db_path or f"{args.database}.{args.target}"
+        if not os.path.exists(path):
+            raise SystemExit(f"数据库文件不存在: {path}")
+        return [connect_embedded(args.target, path)]
+    db_config = {'host': args.host, 'user': args.user, 'password': args.password, 'charset': 'utf8mb4',
+                 'cursorclass': pymysql.cursors.DictCursor}
+    shards = shard_configs(args.shards, db_config, args.database) if args.shards else [
+        dict(db_config, db=args.database)]
+    return [pymysql.connect(**shard) for shard in shards]
+
+
+def existing_tables(connection, tables):
+    """tables中已经存在的表，保持原来的顺序"""
+    existing = []
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(f"SHOW TABLES LIKE '{table}'")
+            if cursor.fetchone():
+                existing.append(table)
+    return existing
+
+
+def reset(connection, dialect, tables, recreate=False, partitioned=False):
+    """按tables的顺序清空(或删除后重建)表，返回{表: 耗时秒数}"""
+    timings = {}
+    with connection.cursor() as cursor:
+        if dialect == "mysql":
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for table in tables:
+                started = time.perf_counter()
+                if recreate:
+                    cursor.execute(f"DROP TABLE {table}")
+                elif dialect == "sqlite":
+                    cursor.execute(f"DELETE FROM {table}")
+                else:
+                    cursor.execute(f"TRUNCATE TABLE {table}")
+                    if (dialect == "mysql" and table in PARTITIONED_TABLES
+                            and read_partitions(connection, table) is not None):
+                        cursor.execute(f"ALTER TABLE {table} REMOVE PARTITIONING")
+                timings[table] = time.perf_counter() - started
+                print(f"  {table:<24} {'已删除' if recreate else '已清空'}  {timings[table]:>8.3f} 秒")
+        finally:
+            if dialect == "mysql":
+                cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    connection.commit()
+    if recreate:
+        started = time.perf_counter()
+        create_tables(connection, partitioned)
+        print(f"  按TABLE_DDL重新建表，耗时 {time.perf_counter() - started:.3f} 秒")
+    return timings
+
+
+def main():
+    args = parse_args()
+    if args.spec:
+        apply_dataset_spec(args.spec)
+    if args.shards and args.target != "mysql":
+        raise SystemExit("--shards 只支持 --target mysql")
+    if args.partition_by_month and (args.target != "mysql" or not args.recreate):
+        raise SystemExit("--partition-by-month 只能与 --target mysql 和 --recreate 一起使用")
+    connections = connect(args)
+    try:
+        # 辅助表不被外键引用，放在最后
+        tables = [existing_tables(connection, teardown_order() + list(AUXILIARY_TABLES))
+                  for connection in connections]
+        if not any(tables):
+            print("没有需要清空的表")
+            return
+        target = args.database if args.target == "mysql" else (args.db_path or f"{args.database}.{args.target}")
+        action = "删除并重建" if args.recreate else "清空"
+        print(f"将{action} {target} 的 {len(tables[0])} 张表"
+              + (f"(共 {len(connections)} 个分片)" if len(connections) > 1 else "") + ": " + ", ".join(tables[0]))
+        if not args.yes and input("输入 yes 继续: ").strip() != "yes":
+            raise SystemExit("已取消")
+
+        started = time.perf_counter()
+        for index, (connection, shard_tables) in enumerate(zip(connections, tables)):
+            if len(connections) > 1:
+                print(f"分片 {index}:")
+            reset(connection, args.target, shard_tables, args.recreate, args.partition_by_month)
+        print(f"{action}完成，耗时 {time.perf_counter() - started:.2f} 秒")
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
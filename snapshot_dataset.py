@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""保存和恢复generate_mock_data.py生成的数据集快照
+
+大规模数据集重新生成的时间远长于性能测试本身。save把数据库中的整套数据按表导出为zstd压缩的Parquet文件，
+连同记录各表行数和SHA-256校验和的manifest.json保存在--snapshot-dir/<键>/下，键由种子、截止日期和
+规模等决定数据内容的参数(与generate_mock_data.py的检查点相同)计算得到；restore用同样的参数找到快照，
+在没有二级索引的空表上批量导入，最后创建索引。目标库中已经是同一个数据集时直接跳过。
+
+save按生成器记录在generation_checkpoints中的数据集参数核对命令行参数，不一致(或库中没有记录，如经过
+实时模拟/变更)时拒绝保存，避免数据以错误的键保存、之后被当作另一个数据集恢复。用--append-until追加过的
+数据集需要同时指定追加到的日期。
+
+    python snapshot_dataset.py save --seed 42 --scale 100 --end-date 2025-01-01
+    python snapshot_dataset.py restore --seed 42 --scale 100 --end-date 2025-01-01 --load-mode infile
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import pyarrow.parquet as pq
+import pymysql
+
+from generate_mock_data import (
+    EMBEDDED_SINKS, PARTITIONED_TABLES, ROLLUP_DDL, TABLE_DDL, Checkpoints, _partition_definitions,
+    _quantize_decimals, apply_dataset_spec, arrow_schema, arrow_table, build_indexes, build_parser, connect_embedded, create_tables,
+    dataset_config, open_sink, read_partitions, selected_indexes, table_column_types, table_count
+)
+
+TARGETS = ("mysql",) + EMBEDDED_SINKS
+MANIFEST = "manifest.json"
+# 生成器记录的运行参数中只影响运行方式、不影响数据内容的项
+RUN_ONLY_KEYS = ("pool_seed", "partition_by_month")
+# 记录目标库当前是哪个快照，restore据此判断能否跳过
+SNAPSHOT_MARKER_DDL = """
+    CREATE TABLE IF NOT EXISTS dataset_snapshot (
+        snapshot_key VARCHAR(64) NOT NULL PRIMARY KEY,
+        config MEDIUMTEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def parse_args():
+    """解析命令行参数：save/restore子命令，数据集和数据库参数与generate_mock_data.py相同"""
+    parser = argparse.ArgumentParser(description='保存和恢复模拟数据集快照')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('save', '把数据库中的数据集保存为快照'),
+                            ('restore', '把快照导入数据库，已是同一数据集时跳过')):
+        command = commands.add_parser(name, parents=[build_parser(add_help=False)], help=help_text,
+                                      description=help_text)
+        command.set_defaults(load_mode='batch')
+        command.add_argument('--snapshot-dir', default='snapshots', help='快照目录，每个数据集一个子目录')
+        command.add_argument('--read-batch-size', type=int, default=100000,
+                             help='导出时每次查询的行数，也是Parquet行组和导入时每批的行数')
+        if name == 'save':
+            command.add_argument('--force', action='store_true', help='快照已存在时覆盖')
+    args = parser.parse_args()
+    if args.spec:
+        # 与生成时相同，描述文件的arguments作为默认值，其中声明的表随数据集一起保存和恢复
+        commands.choices[args.command].set_defaults(**args.spec["arguments"])
+        args = parser.parse_args()
+        apply_dataset_spec(args.spec)
+    return args
+
+
+def snapshot_config(args):
+    """快照对应的数据集参数；必须指定种子，未指定截止日期时与生成时一样为今天"""
+    if args.seed is None:
+        raise SystemExit("快照需要指定 --seed，未指定种子的数据集无法重新对应")
+    config = dataset_config(args)
+    config["end_date"] = config["end_date"] or f"{datetime.now():%Y-%m-%d}"
+    if args.append_until:
+        # 追加窗口的种子与generate_mock_data.py --append-until相同，取--seed
+        config["appended"] = {"until": f"{args.append_until:%Y-%m-%d}", "seed": args.seed}
+    return config
+
+
+def check_recorded_config(connection, config):
+    """核对生成器记录的数据集参数与命令行参数，不一致时退出"""
+    recorded = Checkpoints(connection).dataset()
+    if recorded is None:
+        raise SystemExit("数据库中没有generate_mock_data.py记录的数据集参数(未完整生成、生成被中断，"
+                         "或经过了--simulate/--mutate)，无法确认快照对应的参数")
+    recorded = {key: value for key, value in recorded.items() if key not in RUN_ONLY_KEYS}
+    mismatched = sorted(key for key in set(recorded) | set(config) if recorded.get(key) != config.get(key))
+    if mismatched:
+        details = ", ".join(f"{key}={recorded.get(key)!r}(命令行 {config.get(key)!r})" for key in mismatched)
+        raise SystemExit(f"命令行参数与数据库中数据集的生成参数不一致: {details}")
+
+
+def snapshot_key(config):
+    """数据集参数的SHA-256前16位"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def connect(args):
+    """按--sink打开数据库(MySQL库不存在时创建)，返回连接和open_sink的配置"""
+    if args.sink not in TARGETS:
+        raise SystemExit(f"快照只支持数据库(--sink {'/'.join(TARGETS)})，文件输出本身可以直接复制")
+    if args.sink != "mysql":
+        db_path = args.db_path or f"{args.database}.{args.sink}"
+        return connect_embedded(args.sink, db_path), {"sink": args.sink, "db_path": db_path}
+    db_config = {'host': args.host, 'user': args.user, 'password': args.password, 'charset': 'utf8mb4',
+                 'cursorclass': pymysql.cursors.DictCursor}
+    if args.load_mode == 'infile':
+        db_config['local_infile'] = True
+    connection = pymysql.connect(**db_config)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {args.database}")
+    connection.close()
+    connection = pymysql.connect(db=args.database, **db_config)
+    return connection, {"sink": "mysql", "load_mode": args.load_mode, "batch_size": args.batch_size}
+
+
+def existing_tables(connection):
+    """数据库中已有的数据表(按外键顺序)和汇总表"""
+    tables = []
+    with connection.cursor() as cursor:
+        for table in list(TABLE_DDL) + list(ROLLUP_DDL):
+            cursor.execute(f"SHOW TABLES LIKE '{table}'")
+            if cursor.fetchone():
+                tables.append(table)
+    return tables
+
+
+def iter_table_rows(connection, table, columns, batch_size):
+    """分批读取整张表；数据表按第一列(主键)翻页，汇总表很小，一次读出"""
+    select = f"SELECT {', '.join(columns)} FROM {table}"
+    with connection.cursor() as cursor:
+        if table in ROLLUP_DDL:
+            cursor.execute(f"{select} ORDER BY {', '.join(columns)}")
+            rows = cursor.fetchall()
+            if rows:
+                yield [tuple(row[column] for column in columns) for row in rows]
+            return
+        key, last = columns[0], None
+        while True:
+            if last is None:
+                cursor.execute(f"{select} ORDER BY {key} LIMIT %s", (batch_size,))
+            else:
+                cursor.execute(f"{select} WHERE {key} > %s ORDER BY {key} LIMIT %s", (last, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield [tuple(row[column] for column in columns) for row in rows]
+            last = rows[-1][key]
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_marker(connection):
+    """目标库当前的快照键，没有记录时为None"""
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW TABLES LIKE 'dataset_snapshot'")
+        if not cursor.fetchone():
+            return None
+        cursor.execute("SELECT snapshot_key FROM dataset_snapshot")
+        row = cursor.fetchone()
+    return row["snapshot_key"] if row else None
+
+
+def write_marker(connection, key, config):
+    with connection.cursor() as cursor:
+        cursor.execute(SNAPSHOT_MARKER_DDL)
+        cursor.execute("DELETE FROM dataset_snapshot")
+        cursor.execute("INSERT INTO dataset_snapshot (snapshot_key, config) VALUES (%s, %s)",
+                       (key, json.dumps(config, sort_keys=True)))
+    connection.commit()
+
+
+def _partition_layout(connection):
+    """MySQL分区表的分区布局，JSON中时间上界保存为字符串"""
+    if getattr(connection, "dialect", "mysql") != "mysql":
+        return None
+    layout = {}
+    for table in PARTITIONED_TABLES:
+        bounds = read_partitions(connection, table)
+        if bounds:
+            layout[table] = [(name, f"{upper:%Y-%m-%d %H:%M:%S}" if isinstance(upper, datetime) else upper)
+                             for name, upper in bounds]
+    return layout or None
+
+
+def save(args, connection, config, key):
+    """核对数据集参数后导出到<snapshot-dir>/<键>/，先写入临时目录，完成后再改名"""
+    tables = existing_tables(connection)
+    if "orders" not in tables or not table_count(connection, "orders"):
+        raise SystemExit("订单表没有数据，请先用generate_mock_data.py生成数据")
+    check_recorded_config(connection, config)
+    directory = os.path.join(args.snapshot_dir, key)
+    if os.path.exists(os.path.join(directory, MANIFEST)) and not args.force:
+        print(f"快照 {key} 已存在: {directory} (使用 --force 覆盖)")
+        return
+    staging = f"{directory}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    manifest = {"key": key, "config": config, "created_at": f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+                "partitions": _partition_layout(connection), "tables": {}}
+    for table in tables:
+        started = time.perf_counter()
+        columns = list(table_column_types(table))
+        schema = arrow_schema(table, columns)
+        path = os.path.join(staging, f"{table}.parquet")
+        rows = 0
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for batch in iter_table_rows(connection, table, columns, max(1, args.read_batch_size)):
+                writer.write_table(arrow_table(schema, _quantize_decimals(table, columns, batch)))
+                rows += len(batch)
+        manifest["tables"][table] = {"rows": rows, "columns": columns, "file": f"{table}.parquet",
+                                     "bytes": os.path.getsize(path), "sha256": file_checksum(path)}
+        print(f"  {table:<25} {rows:>10} 行  {os.path.getsize(path) / 1e6:>9.1f} MB  "
+              f"{time.perf_counter() - started:>7.2f} 秒")
+    with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    write_marker(connection, key, config)
+    print(f"快照已保存到: {directory}")
+
+
+def _restore_partitions(connection, loader, layout):
+    """按快照中的分区布局把空的orders/order_items/visit_logs改为分区表，并让写入按分区路由"""
+    routes = {}
+    with connection.cursor() as cursor:
+        for table, bounds in layout.items():
+            bounds = [(name, datetime.strptime(upper, "%Y-%m-%d %H:%M:%S") if isinstance(upper, str) else upper)
+                      for name, upper in bounds]
+            cursor.execute(f"ALTER TABLE {table} PARTITION BY RANGE ({PARTITIONED_TABLES[table][1]}) "
+                           f"({_partition_definitions(table, bounds)})")
+            routes[table] = (PARTITIONED_TABLES[table][0], bounds)
+    connection.commit()
+    loader.route_partitions(routes)
+
+
+def restore(args, connection, sink_config, key):
+    """把快照导入空的数据库；目标库已经是该快照且各表行数一致时跳过"""
+    directory = os.path.join(args.snapshot_dir, key)
+    manifest_path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise SystemExit(f"没有找到快照 {key} ({directory})，请先用相同参数生成数据后执行 save")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    tables = manifest["tables"]
+
+    present = existing_tables(connection)
+    if read_marker(connection) == key and all(
+            table in present and table_count(connection, table) == info["rows"] for table, info in tables.items()):
+        print(f"数据库中已是快照 {key} 的数据集，跳过导入")
+        return
+    for table, info in tables.items():
+        if file_checksum(os.path.join(directory, info["file"])) != info["sha256"]:
+            raise SystemExit(f"快照文件 {info['file']} 的校验和与manifest不一致，快照已损坏")
+    not_empty = [table for table in tables if table in present and table_count(connection, table)]
+    if not_empty:
+        raise SystemExit(f"目标数据库中已有其他数据({', '.join(not_empty)})，请在空库上恢复")
+
+    partitions = manifest.get("partitions") if args.sink == "mysql" else None
+    create_tables(connection, bool(partitions))
+    with connection.cursor() as cursor:
+        for table in tables:
+            if table in ROLLUP_DDL:
+                cursor.execute(ROLLUP_DDL[table])
+        if args.sink == "mysql":
+            # 快照来自完整的数据集，导入期间不需要外键和唯一性检查
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            cursor.execute("SET UNIQUE_CHECKS = 0")
+    connection.commit()
+
+    loader = open_sink(sink_config, connection)
+    if partitions:
+        _restore_partitions(connection, loader, partitions)
+    for table, info in tables.items():
+        started = time.perf_counter()
+        columns = info["columns"]
+        parquet = pq.ParquetFile(os.path.join(directory, info["file"]))
+        for batch in parquet.iter_batches(batch_size=max(1, args.read_batch_size), columns=columns):
+            values = batch.to_pydict()
+            loader.load(table, columns, list(zip(*(values[column] for column in columns))))
+            loader.commit()
+        print(f"  {table:<25} {info['rows']:>10} 行  {time.perf_counter() - started:>7.2f} 秒")
+    loader.finish()
+    if args.sink == "mysql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET UNIQUE_CHECKS = 1")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    mismatched = [table for table, info in tables.items() if table_count(connection, table) != info["rows"]]
+    if mismatched:
+        raise SystemExit(f"导入后行数与manifest不一致: {', '.join(mismatched)}")
+    build_indexes(connection, selected_indexes(args.index))
+    write_marker(connection, key, manifest["config"])
+    # 与生成器一样记录数据集参数，恢复后的库可以继续追加数据和保存快照
+    Checkpoints(connection).record_dataset(manifest["config"])
+    loader.print_report()
+    print(f"快照 {key} 已恢复")
+
+
+def main():
+    args = parse_args()
+    config = snapshot_config(args)
+    key = snapshot_key(config)
+    connection, sink_config = connect(args)
+    started = time.perf_counter()
+    try:
+        print(f"{'保存' if args.command == 'save' else '恢复'}快照 {key} (种子 {config['seed']}，"
+              f"规模 {config['scale']}，截止日期 {config['end_date']})")
+        if args.command == "save":
+            save(args, connection, config, key)
+        else:
+            restore(args, connection, sink_config, key)
+    finally:
+        connection.close()
+    print(f"耗时 {time.perf_counter() - started:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
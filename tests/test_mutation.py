@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""--mutate之后库存台账仍然平衡，已取消/已退款的订单不被状态流转重新打开，数据仍通过verify_dataset.py"""
+
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SMALL_DATASET = ["--months", "3", "--users", "300", "--products", "60", "--orders-per-month", "300-400",
+                 "--visits-per-order", "0", "--seed", "7", "--end-date", "2025-01-01"]
+
+
+def run_script(tmp_path, script, *args):
+    return subprocess.run([sys.executable, str(ROOT / script), *args], cwd=tmp_path,
+                          capture_output=True, text=True, timeout=600)
+
+
+def generate(tmp_path, db_path, *args):
+    result = run_script(tmp_path, "generate_mock_data.py", "--sink", "sqlite", "--db-path", str(db_path),
+                        "--report", str(tmp_path / "report.json"), *args)
+    assert "数据生成完成" in result.stdout, result.stdout + result.stderr
+
+
+def query(db_path, sql):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def unbalanced_products(db_path):
+    """库存变动合计与stock_quantity不一致的商品"""
+    return query(db_path, "SELECT p.product_id, p.stock_quantity, SUM(r.quantity_change) FROM products p "
+                          "LEFT JOIN inventory_records r ON r.product_id = p.product_id "
+                          "GROUP BY p.product_id, p.stock_quantity "
+                          "HAVING p.stock_quantity != COALESCE(SUM(r.quantity_change), 0)")
+
+
+def final_orders(db_path):
+    return set(query(db_path, "SELECT order_id, order_status FROM orders WHERE order_status IN ('已取消', '已退款')"))
+
+
+def test_mutation_keeps_inventory_ledger_and_final_orders(tmp_path):
+    db_path = tmp_path / "ecommerce.sqlite"
+    generate(tmp_path, db_path, *SMALL_DATASET)
+    assert unbalanced_products(db_path) == []
+    final_before = final_orders(db_path)
+    returns_before = query(db_path, "SELECT COUNT(*) FROM returns")[0][0]
+
+    generate(tmp_path, db_path, "--mutate", "--rate", "200", "--duration", "3", "--status-delay", "0.2",
+             "--mutation-batch", "50", "--mutation-mix", "status=1,refund=3")
+
+    # 退款写入了退货，并有对应的退货入库记录和库存
+    assert query(db_path, "SELECT COUNT(*) FROM returns")[0][0] > returns_before
+    assert unbalanced_products(db_path) == []
+    assert query(db_path, "SELECT COUNT(*) FROM returns WHERE return_status = '已退款'") == \
+        query(db_path, "SELECT COUNT(*) FROM inventory_records WHERE reason = '退货入库'")
+    assert final_orders(db_path) >= final_before
+    assert query(db_path, "SELECT COUNT(*) FROM orders WHERE order_status = '处理中'") == [(0,)]
+
+    result = run_script(tmp_path, "verify_dataset.py", "--target", "sqlite", "--db-path", str(db_path),
+                        "--output", str(tmp_path / "verify_report.json"))
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""订单按块生成：峰值内存不随每月订单数增长，块的切分与规划的ID区间一致"""
+
+import decimal
+import sys
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_mock_data as g  # noqa: E402
+
+BLOCK_ORDERS = 2000
+USER_IDS = list(range(1, 3001))
+PRODUCT_IDS = list(range(1, 301))
+PRODUCT_PRICES = {product_id: decimal.Decimal("99.90") for product_id in PRODUCT_IDS}
+
+
+@pytest.fixture(scope="module")
+def pools():
+    return g.ValuePools.build(2000, 1)
+
+
+def month_shard(order_count, engine, seed=123):
+    return {
+        "index": 0, "start_date": datetime(2025, 1, 1), "days": 30, "in_campaign": False, "campaigns": [],
+        "order_count": order_count, "item_count": g.shard_item_count(seed, order_count, len(PRODUCT_IDS), engine),
+        "first_order_id": 1, "first_item_id": 1, "seed": seed,
+    }
+
+
+def consume(shard, pools, engine):
+    """生成整个分片并丢弃，检查订单/明细ID连续，返回峰值内存"""
+    next_order_id = next_item_id = 1
+    tracemalloc.start()
+    try:
+        for order_rows, item_rows in g.iter_order_chunks([shard], USER_IDS, PRODUCT_IDS, PRODUCT_PRICES, pools,
+                                                         500, engine):
+            assert [row[0] for row in order_rows] == list(range(next_order_id, next_order_id + len(order_rows)))
+            assert [row[0] for row in item_rows] == list(range(next_item_id, next_item_id + len(item_rows)))
+            next_order_id += len(order_rows)
+            next_item_id += len(item_rows)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert (next_order_id - 1, next_item_id - 1) == (shard["order_count"], shard["item_count"])
+    return peak
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_peak_memory_does_not_grow_with_orders_per_month(monkeypatch, pools, engine):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(g, "SHARD_BLOCK_ORDERS", BLOCK_ORDERS)
+    small = month_shard(BLOCK_ORDERS, engine)
+    large = month_shard(BLOCK_ORDERS * 8, engine)
+
+    # 8倍的订单数，峰值内存仍与一个块相当
+    assert consume(large, pools, engine) < consume(small, pools, engine) * 1.5
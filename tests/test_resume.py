@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""中断后--resume继续的运行(含--append-until追加)得到与不中断的运行相同的数据"""
+
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SMALL_DATASET = ["--months", "3", "--users", "300", "--products", "60", "--orders-per-month", "300-400",
+                 "--visits-per-order", "0-3", "--seed", "7", "--end-date", "2025-01-01", "--chunk-size", "100"]
+APPEND = ["--append-until", "2025-03-01", "--seed", "7", "--chunk-size", "100"]
+
+# 提交第N个订单块之前抛出异常，模拟运行在订单阶段中途中断
+INTERRUPT = """
+import sys
+sys.path.insert(0, sys.argv.pop(1))
+import generate_mock_data as g
+
+chunks = int(sys.argv.pop(1))
+order_recorder = g.Checkpoints.order_recorder
+
+
+def interrupting_recorder(self, shards, connection=None):
+    record = order_recorder(self, shards, connection)
+    committed = [0]
+
+    def interrupt(chunk):
+        if committed[0] == chunks:
+            raise RuntimeError("模拟中断")
+        committed[0] += 1
+        record(chunk)
+
+    return interrupt
+
+
+g.Checkpoints.order_recorder = interrupting_recorder
+g.main()
+"""
+
+
+def generate(tmp_path, db_path, *args, interrupt_after=None):
+    command = [sys.executable, str(ROOT / "generate_mock_data.py")]
+    if interrupt_after is not None:
+        command = [sys.executable, "-c", INTERRUPT, str(ROOT), str(interrupt_after)]
+    result = subprocess.run([*command, "--sink", "sqlite", "--db-path", str(db_path),
+                             "--report", str(tmp_path / "report.json"), *args],
+                            cwd=tmp_path, capture_output=True, text=True, timeout=600)
+    if interrupt_after is None:
+        assert "数据生成完成" in result.stdout, result.stdout + result.stderr
+    else:
+        assert "模拟中断" in result.stdout, result.stdout + result.stderr
+    return result.stdout
+
+
+def dump(db_path):
+    """各表按主键排序的全部行，不含由数据库填入当前时间的列"""
+    connection = sqlite3.connect(db_path)
+    try:
+        tables = [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        data = {}
+        for table in tables:
+            info = connection.execute(f"PRAGMA table_info({table})").fetchall()
+            columns = [row[1] for row in info if row[4] != "CURRENT_TIMESTAMP"]
+            keys = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]] or columns
+            data[table] = connection.execute(
+                f"SELECT {', '.join(columns)} FROM {table} ORDER BY {', '.join(keys)}").fetchall()
+        return data
+    finally:
+        connection.close()
+
+
+def assert_same_tables(db_path, expected_path):
+    data, expected = dump(db_path), dump(expected_path)
+    assert data.keys() == expected.keys()
+    for table in expected:
+        assert data[table] == expected[table], table
+    assert expected["orders"] and expected["order_items"]
+
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    clean, resumed = tmp_path / "clean.sqlite", tmp_path / "resumed.sqlite"
+    generate(tmp_path, clean, *SMALL_DATASET)
+    generate(tmp_path, resumed, *SMALL_DATASET, interrupt_after=4)
+    output = generate(tmp_path, resumed, *SMALL_DATASET, "--resume")
+    assert "从检查点恢复订单" in output
+    assert_same_tables(resumed, clean)
+
+
+def test_resumed_append_matches_uninterrupted_append(tmp_path):
+    clean, resumed = tmp_path / "clean.sqlite", tmp_path / "resumed.sqlite"
+    for db_path in (clean, resumed):
+        generate(tmp_path, db_path, *SMALL_DATASET)
+    generate(tmp_path, clean, *APPEND)
+    generate(tmp_path, resumed, *APPEND, interrupt_after=3)
+
+    # 中断的追加还没有数据集参数的记录；直接重新执行会在部分数据上再追加一次，必须拒绝
+    connection = sqlite3.connect(resumed)
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM generation_checkpoints WHERE name = 'dataset'").fetchone() == (0,)
+    finally:
+        connection.close()
+    result = subprocess.run([sys.executable, str(ROOT / "generate_mock_data.py"), "--sink", "sqlite",
+                             "--db-path", str(resumed), "--report", str(tmp_path / "report.json"), *APPEND],
+                            cwd=tmp_path, capture_output=True, text=True, timeout=600)
+    assert "请加上--resume" in result.stdout, result.stdout + result.stderr
+
+    generate(tmp_path, resumed, *APPEND, "--resume")
+    assert_same_tables(resumed, clean)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""snapshot_dataset.py：保存、清空后恢复得到相同的数据，已是同一数据集时跳过，快照损坏或参数不一致时拒绝"""
+
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+ROOT = Path(__file__).resolve().parent.parent
+SMALL_DATASET = ["--months", "3", "--users", "300", "--products", "60", "--orders-per-month", "300-400",
+                 "--visits-per-order", "0-3", "--seed", "7", "--end-date", "2025-01-01"]
+
+
+def run_script(tmp_path, script, *args):
+    return subprocess.run([sys.executable, str(ROOT / script), *args], cwd=tmp_path,
+                          capture_output=True, text=True, timeout=600)
+
+
+def snapshot(tmp_path, command, db_path, *args):
+    return run_script(tmp_path, "snapshot_dataset.py", command, "--sink", "sqlite", "--db-path", str(db_path),
+                      "--snapshot-dir", str(tmp_path / "snapshots"), *SMALL_DATASET, *args)
+
+
+def dump(db_path):
+    """各表按主键排序的全部行，不含由数据库填入当前时间的列"""
+    connection = sqlite3.connect(db_path)
+    try:
+        tables = [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        data = {}
+        for table in tables:
+            info = connection.execute(f"PRAGMA table_info({table})").fetchall()
+            columns = [row[1] for row in info if row[4] != "CURRENT_TIMESTAMP"]
+            keys = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]] or columns
+            rows = connection.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {', '.join(keys)}")
+            # SQLite汇总表中的金额是浮点数求和，导出为DECIMAL再导入后只在末位有差别
+            data[table] = [tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+                           for row in rows]
+        return data
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def saved(tmp_path):
+    """生成小数据集并保存快照，返回数据库路径和保存时的数据"""
+    db_path = tmp_path / "ecommerce.sqlite"
+    result = run_script(tmp_path, "generate_mock_data.py", "--sink", "sqlite", "--db-path", str(db_path),
+                        "--report", str(tmp_path / "report.json"), *SMALL_DATASET)
+    assert "数据生成完成" in result.stdout, result.stdout + result.stderr
+    result = snapshot(tmp_path, "save", db_path)
+    assert "快照已保存到" in result.stdout, result.stdout + result.stderr
+    return db_path, dump(db_path)
+
+
+def reset(tmp_path, db_path):
+    result = run_script(tmp_path, "reset_dataset.py", "--target", "sqlite", "--db-path", str(db_path), "--yes")
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert not sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+
+def test_restore_after_reset_matches_saved_dataset(tmp_path, saved):
+    db_path, expected = saved
+    reset(tmp_path, db_path)
+    result = snapshot(tmp_path, "restore", db_path)
+    assert "已恢复" in result.stdout, result.stdout + result.stderr
+
+    data = dump(db_path)
+    assert data.keys() == expected.keys()
+    for table in expected:
+        # 恢复时记录的数据集参数取自快照，不含pool_seed等只影响运行方式的参数
+        if table != "generation_checkpoints":
+            assert data[table] == expected[table], table
+    # 恢复时写回数据集参数的记录，恢复后的库可以再次保存
+    assert snapshot(tmp_path, "save", db_path).returncode == 0
+
+
+def test_restore_skips_when_database_already_holds_snapshot(tmp_path, saved):
+    db_path, expected = saved
+    result = snapshot(tmp_path, "restore", db_path)
+    assert "跳过导入" in result.stdout, result.stdout + result.stderr
+    assert dump(db_path)["orders"] == expected["orders"]
+
+
+def test_restore_rejects_corrupted_snapshot(tmp_path, saved):
+    db_path, _ = saved
+    reset(tmp_path, db_path)
+    (snapshot_dir,) = (tmp_path / "snapshots").iterdir()
+    with open(snapshot_dir / "orders.parquet", "r+b") as f:
+        f.seek(100)
+        byte = f.read(1)
+        f.seek(100)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    result = snapshot(tmp_path, "restore", db_path)
+    assert result.returncode != 0
+    assert "校验和" in result.stderr, result.stdout + result.stderr
+    assert not sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+
+def test_save_rejects_arguments_that_differ_from_generation(tmp_path, saved):
+    db_path, _ = saved
+    result = snapshot(tmp_path, "save", db_path, "--users", "400", "--force")
+    assert result.returncode != 0
+    assert "不一致" in result.stderr and "users" in result.stderr, result.stdout + result.stderr
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""未经修改的生成结果(含追加数据)应当通过verify_dataset.py的全部检查"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SMALL_DATASET = ["--months", "3", "--users", "300", "--products", "60", "--orders-per-month", "300-400",
+                 "--visits-per-order", "0", "--seed", "7", "--end-date", "2025-01-01"]
+
+
+def run_script(tmp_path, script, *args):
+    return subprocess.run([sys.executable, str(ROOT / script), *args], cwd=tmp_path,
+                          capture_output=True, text=True, timeout=600)
+
+
+def generate(tmp_path, db_path, *args):
+    result = run_script(tmp_path, "generate_mock_data.py", "--sink", "sqlite", "--db-path", str(db_path),
+                        "--report", str(tmp_path / "report.json"), *args)
+    assert "数据生成完成" in result.stdout, result.stdout + result.stderr
+
+
+def verify(tmp_path, db_path):
+    output = tmp_path / "verify_report.json"
+    result = run_script(tmp_path, "verify_dataset.py", "--target", "sqlite", "--db-path", str(db_path),
+                        "--output", str(output))
+    failed = None
+    if output.exists():
+        checks = json.loads(output.read_text(encoding="utf-8"))["checks"]
+        failed = {name: check["samples"] for name, check in checks.items() if check["violations"]}
+    assert result.returncode == 0, failed or result.stdout + result.stderr
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_generated_dataset_passes_verification(tmp_path, engine):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+    db_path = tmp_path / "ecommerce.sqlite"
+    # 活动数多于3个月能排下的数量，活动日期需要压缩到数据时间窗口内
+    generate(tmp_path, db_path, *SMALL_DATASET, "--engine", engine, "--campaigns", "12")
+    verify(tmp_path, db_path)
+
+
+def test_appended_dataset_passes_verification(tmp_path):
+    db_path = tmp_path / "ecommerce.sqlite"
+    generate(tmp_path, db_path, *SMALL_DATASET, "--distribution", "skewed")
+    generate(tmp_path, db_path, "--append-until", "2025-04-01", "--seed", "7")
+    verify(tmp_path, db_path)
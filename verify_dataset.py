@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""检查generate_mock_data.py生成的数据集的一致性
+
+生成器在Python中按明细计算订单的total_amount和discount_amount，批量导入时(infile模式、分区表)
+外键也可能没有被数据库检查。这里把每项检查写成集合查询，按主键把表切成ID区间，
+由多个连接并行执行，数据量很大时也不需要逐行比较：
+
+- order_totals:               订单金额/折扣与其明细的(单价-折扣)×数量之和、折扣×数量之和不一致
+- campaign_window:            关联到活动的订单，下单日期不在该活动的起止日期内
+- discount_outside_campaign:  有折扣的订单，下单日期不在任何活动的起止日期内
+- fk_<表>_<列>:               TABLE_DDL中的每个外键，子表中引用了不存在的父表行(如孤立的订单明细)
+
+每项检查输出不一致的行数和按ID排序的前几行样例，结果写入JSON；发现不一致时以非零状态退出。
+"""
+
+import argparse
+import json
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pymysql
+
+from generate_mock_data import EMBEDDED_SINKS, TABLE_DDL, apply_dataset_spec, connect_embedded, load_dataset_spec
+
+TARGETS = ("mysql",) + EMBEDDED_SINKS
+
+ORDER_CHECKS = [
+    {
+        "name": "order_totals",
+        "description": "订单金额/折扣与明细之和不一致(含没有明细但金额不为0的订单)",
+        "table": "orders", "range_column": "order_id", "key": "o.order_id",
+        "columns": "o.order_id, o.total_amount, i.item_total, o.discount_amount, i.item_discount",
+        "body": """
+            FROM orders o
+            LEFT JOIN (
+                SELECT order_id, SUM((unit_price - discount) * quantity) AS item_total,
+                       SUM(discount * quantity) AS item_discount
+                FROM order_items
+                WHERE order_id >= %s AND order_id < %s
+                GROUP BY order_id
+            ) i ON i.order_id = o.order_id
+            WHERE o.order_id >= %s AND o.order_id < %s
+              AND (ABS(COALESCE(o.total_amount, 0) - COALESCE(i.item_total, 0)) >= 0.005
+                   OR ABS(COALESCE(o.discount_amount, 0) - COALESCE(i.item_discount, 0)) >= 0.005)
+        """,
+    },
+    {
+        "name": "campaign_window",
+        "description": "关联到活动的订单，下单日期不在该活动的起止日期内",
+        "table": "order_campaign_map", "range_column": "id", "key": "m.id",
+        "columns": "m.order_id, o.order_date, m.campaign_id, c.start_date, c.end_date",
+        "body": """
+            FROM order_campaign_map m
+            JOIN orders o ON o.order_id = m.order_id
+            JOIN marketing_campaigns c ON c.campaign_id = m.campaign_id
+            WHERE m.id >= %s AND m.id < %s
+              AND (DATE(o.order_date) < c.start_date OR DATE(o.order_date) > c.end_date)
+        """,
+    },
+    {
+        "name": "discount_outside_campaign",
+        "description": "有折扣的订单，下单日期不在任何活动的起止日期内",
+        "table": "orders", "range_column": "order_id", "key": "o.order_id",
+        "columns": "o.order_id, o.order_date, o.discount_amount",
+        "body": """
+            FROM orders o
+            WHERE o.order_id >= %s AND o.order_id < %s AND o.discount_amount > 0
+              AND NOT EXISTS (SELECT 1 FROM marketing_campaigns c
+                              WHERE DATE(o.order_date) BETWEEN c.start_date AND c.end_date)
+        """,
+    },
+]
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='检查模拟数据集的一致性')
+    parser.add_argument('--target', choices=TARGETS, default='mysql',
+                        help='数据库: mysql，或generate_mock_data.py --sink sqlite/duckdb生成的本地数据库文件')
+    parser.add_argument('--db-path', default=None,
+                        help='sqlite/duckdb数据库文件路径，默认为<database>.sqlite或<database>.duckdb')
+    parser.add_argument('--host', default='localhost', help='数据库主机地址')
+    parser.add_argument('--user', default='root', help='数据库用户名')
+    parser.add_argument('--password', default='', help='数据库密码')
+    parser.add_argument('--database', default='ecommerce', help='数据库名称')
+    parser.add_argument('--workers', type=int, default=4, help='并行执行检查的连接数')
+    parser.add_argument('--chunk-size', type=int, default=500000, help='每个ID区间包含的主键数')
+    parser.add_argument('--samples', type=int, default=5, help='每项检查输出的不一致样例行数')
+    parser.add_argument('--match', default=None, help='只执行名称匹配该正则表达式的检查')
+    parser.add_argument('--output', default='verify_report.json', help='结果JSON路径')
+    parser.add_argument('--spec', type=load_dataset_spec, default=None,
+                        help='生成时使用的--spec描述文件，同时检查其中声明的表的外键')
+    return parser.parse_args()
+
+
+def foreign_key_checks():
+    """TABLE_DDL中每个外键一项检查：子表的外键列不为NULL但父表中没有对应的行"""
+    checks = []
+    for table, ddl in TABLE_DDL.items():
+        key = re.search(r"^\s*(\w+)\s", ddl.split("(", 1)[1]).group(1)
+        for column, parent, parent_column in re.findall(r"FOREIGN KEY \((\w+)\) REFERENCES (\w+)\((\w+)\)", ddl):
+            checks.append({
+                "name": f"fk_{table}_{column}",
+                "description": f"{table}.{column} 引用的 {parent}.{parent_column} 不存在",
+                "table": table, "range_column": key, "key": f"child.{key}",
+                "columns": f"child.{key}, child.{column}",
+                "body": f"""
+                    FROM {table} child
+                    LEFT JOIN {parent} parent ON parent.{parent_column} = child.{column}
+                    WHERE child.{key} >= %s AND child.{key} < %s
+                      AND child.{column} IS NOT NULL AND parent.{parent_column} IS NULL
+                """,
+            })
+    return checks
+
+
+def connect(args):
+    """打开一个到被检查数据库的连接"""
+    if args.target == "mysql":
+        return pymysql.connect(host=args.host, user=args.user, password=args.password, db=args.database,
+                               charset='utf8mb4', cursorclass=pymysql.cursors.DictCursor)
+    return connect_embedded(args.target, args.db_path or f"{args.database}.{args.target}")
+
+
+def id_ranges(connection, table, column, chunk_size):
+    """把表的主键范围切成[下界, 上界)区间"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN({column}) AS low, MAX({column}) AS high FROM {table}")
+        row = cursor.fetchone()
+    if row["low"] is None:
+        return []
+    low, high = int(row["low"]), int(row["high"]) + 1
+    return [(start, min(start + chunk_size, high)) for start in range(low, high, chunk_size)]
+
+
+def run_chunk(pool, check, low, high, samples):
+    """在一个ID区间上执行检查，返回(不一致行数, 样例行, 耗时)"""
+    connection = pool.get()
+    started = time.perf_counter()
+    try:
+        params = (low, high) * (check["body"].count("%s") // 2)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) AS violations {check['body']}", params)
+            violations = int(cursor.fetchone()["violations"])
+            rows = []
+            if violations and samples:
+                cursor.execute(f"SELECT {check['columns']} {check['body']} ORDER BY {check['key']} LIMIT %s",
+                               params + (samples,))
+                rows = cursor.fetchall()
+        # 只读查询，结束事务以免长时间持有快照
+        connection.commit()
+        return violations, rows, time.perf_counter() - started
+    finally:
+        pool.put(connection)
+
+
+def verify(connections, checks, chunk_size, samples):
+    """按ID区间并行执行所有检查，返回{检查名: 结果}"""
+    pool = queue.Queue()
+    for connection in connections:
+        pool.put(connection)
+    results = {}
+    tasks = []
+    for check in checks:
+        ranges = id_ranges(connections[0], check["table"], check["range_column"], chunk_size)
+        results[check["name"]] = {"description": check["description"], "violations": 0, "chunks": len(ranges),
+                                  "seconds": 0.0, "samples": []}
+        tasks.extend((check, low, high) for low, high in ranges)
+
+    print(f"执行 {len(checks)} 项检查，共 {len(tasks)} 个ID区间，并行连接数 {len(connections)}")
+    last_report = time.perf_counter()
+    with ThreadPoolExecutor(len(connections)) as executor:
+        futures = {executor.submit(run_chunk, pool, check, low, high, samples): check for check, low, high in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            violations, rows, seconds = future.result()
+            result = results[futures[future]["name"]]
+            result["violations"] += violations
+            result["seconds"] += seconds
+            result["samples"].extend(rows)
+            if time.perf_counter() - last_report >= 10:
+                print(f"  已完成 {done}/{len(tasks)} 个区间")
+                last_report = time.perf_counter()
+
+    for result in results.values():
+        result["samples"] = sorted(result["samples"], key=lambda row: list(row.values())[0])[:samples]
+        result["seconds"] = round(result["seconds"], 3)
+    return results
+
+
+def main():
+    args = parse_args()
+    if args.spec:
+        apply_dataset_spec(args.spec)
+    checks = ORDER_CHECKS + foreign_key_checks()
+    if args.match:
+        checks = [check for check in checks if re.search(args.match, check["name"])]
+    connections = [connect(args) for _ in range(max(1, args.workers))]
+    started = time.perf_counter()
+    try:
+        results = verify(connections, checks, max(1, args.chunk_size), max(0, args.samples))
+    finally:
+        for connection in connections:
+            connection.close()
+    wall_seconds = time.perf_counter() - started
+
+    failed = [name for name, result in results.items() if result["violations"]]
+    for name, result in results.items():
+        status = "不一致" if result["violations"] else "通过"
+        print(f"  {name:<40} {status:<4} {result['violations']:>10} 行  {result['seconds']:>8.2f} 秒")
+        for row in result["samples"]:
+            print(f"      {row}")
+    report = {
+        "config": {"target": args.target, "database": args.db_path or args.database, "workers": len(connections),
+                   "chunk_size": args.chunk_size},
+        "checks": results,
+        "totals": {"checks": len(results), "failed": failed, "wall_seconds": round(wall_seconds, 3)},
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True, default=str)
+    print(f"检查结果已写入: {args.output}")
+    if failed:
+        raise SystemExit(f"{len(failed)} 项检查发现不一致: {', '.join(failed)}")
+    print(f"全部 {len(results)} 项检查通过，耗时 {wall_seconds:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()